@@ -23,9 +23,10 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 
-from agent.rag.rag_loader import load_and_split_markdown
-from agent.rag.vector_store import create_vectorstore
-from agent.orchestrator.orchestrator import orchestrator_agent, OrchestratorDeps
+from agent.rag.collection_registry import load_retrieval_from_env
+from agent.orchestrator.orchestrator import ask_orchestrator, OrchestratorDeps
+from agent.profiling import maybe_profile, profiler_from_env
+from agent.singleflight import coalescing_stats, format_coalescing_stats
 
 
 @dataclass
@@ -241,13 +242,13 @@ EVALUATION_CASES = [
 # EVALUATION RUNNER
 # ============================================================================
 
-def run_agent_query(query: str, deps) -> Dict[str, Any]:
+def run_agent_query(query: str, deps, profiler=None) -> Dict[str, Any]:
     """Run a query through the orchestrator with retry logic"""
     try:
         for attempt in range(3):
             try:
-                run_result = orchestrator_agent.run_sync(query, deps=deps)
-                result = run_result.output if hasattr(run_result, 'output') else run_result
+                with maybe_profile(profiler):
+                    result = ask_orchestrator(query, deps)
                 return {
                     "answer": result.answer,
                     "source": result.source,
@@ -360,12 +361,15 @@ if __name__ == "__main__":
     print("SECOND BRAIN AGENT - EVALUATION SUITE")
     print("="*80 + "\n")
     
+    # Opt-in hot-path profiling: `python evaluation.py --profile` or SBA_PROFILE=1
+    profiler = profiler_from_env()
+
     print("Initializing system...")
-    docs = load_and_split_markdown("data/docs.md")
-    vector_db = create_vectorstore(docs)
+    vector_db, collections = load_retrieval_from_env("data/docs.md")
     deps = OrchestratorDeps(
         vector_db=vector_db,
         profile_file="data/user_profile.json",
+        collections=collections,
     )
     print("✓ System initialized\n")
     
@@ -383,7 +387,7 @@ if __name__ == "__main__":
         print("-" * 80)
         
         # Run query
-        query_result = run_agent_query(case.inputs, deps)
+        query_result = run_agent_query(case.inputs, deps, profiler)
         
         # Evaluate
         evaluation = evaluate_case(case, query_result)
@@ -414,10 +418,15 @@ if __name__ == "__main__":
         })
     
     # Save results
+    results['coalescing'] = coalescing_stats()
     output_file = f"evaluation_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     with open(output_file, 'w') as f:
         json.dump(results, f, indent=2)
     
     print_results_summary(results)
+    print(f"Coalescing: {format_coalescing_stats()}")
     print(f"\nDetailed results saved to: {output_file}")
+    if profiler is not None:
+        for path in profiler.write_reports():
+            print(f"Profile written to: {path}")
     print("\nEvaluation complete!")
@@ -0,0 +1,187 @@
+"""
+Record/replay of model and tool I/O for deterministic offline runs.
+
+In record mode every model request/response and every wrapped tool call is captured
+into a cassette JSON file. In replay mode the same calls are served back from the
+cassette (optionally sleeping for the recorded, or scaled, latency), so the full
+orchestrator -> child pipeline runs without Groq or DuckDuckGo.
+
+Every call also reports its duration to the active cassette, keyed by stage
+("model:rag", "tool:search_docs", ...), which perf.py uses for regression checks.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import TypeAdapter
+from pydantic_ai.messages import ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.wrapper import WrapperModel
+
+
+class CassetteMiss(LookupError):
+    """Replay hit a call that was never recorded."""
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, latency_scale: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        if mode == "replay":
+            with open(path, "r") as f:
+                self._entries.update(json.load(f)["entries"])
+
+    def save(self) -> None:
+        with self._lock:
+            data = {"version": 1, "entries": dict(self._entries)}
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=1)
+
+    def put(self, key: str, payload: Any, latency: float) -> None:
+        with self._lock:
+            self._entries[key].append({"payload": payload, "latency": latency})
+
+    def take(self, key: str) -> Dict[str, Any]:
+        """Next recorded entry for key; repeated calls beyond the recording reuse the last one."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(key)
+            i = self._cursor[key]
+            self._cursor[key] = i + 1
+            return entries[min(i, len(entries) - 1)]
+
+    def replay_delay(self, entry: Dict[str, Any]) -> float:
+        return entry["latency"] * self.latency_scale
+
+    def record_timing(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[stage].append(seconds)
+
+
+# Module-level rather than a ContextVar: child agents and tools run on worker threads
+_active: Optional[Cassette] = None
+
+
+def active() -> Optional[Cassette]:
+    return _active
+
+
+def _key(kind: str, name: str, args: Any) -> str:
+    digest = hashlib.sha256(json.dumps(args, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{kind}:{name}:{digest}"
+
+
+def recorded_tool(name: str, return_type: Any, skip_args: int = 0) -> Callable:
+    """Decorator for tool implementations; the first `skip_args` positional args (e.g. deps) are left out of the key."""
+    adapter = TypeAdapter(return_type)
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cassette = _active
+            if cassette is None:
+                return fn(*args, **kwargs)
+            key = _key("tool", name, [args[skip_args:], kwargs])
+            start = time.perf_counter()
+            if cassette.mode == "replay":
+                entry = cassette.take(key)
+                time.sleep(cassette.replay_delay(entry))
+                result = adapter.validate_python(entry["payload"])
+            else:
+                result = fn(*args, **kwargs)
+                cassette.put(key, adapter.dump_python(result, mode="json"), time.perf_counter() - start)
+            cassette.record_timing(f"tool:{name}", time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+def _messages_key(agent_name: str, messages) -> str:
+    # Only the conversational content: timestamps and provider call ids differ between runs
+    parts = []
+    for message in messages:
+        for part in getattr(message, "parts", []):
+            parts.append([
+                part.part_kind,
+                getattr(part, "tool_name", None),
+                getattr(part, "content", None),
+                getattr(part, "args", None),
+            ])
+    return _key("model", agent_name, parts)
+
+
+def _dump_response(response: ModelResponse) -> Any:
+    return ModelMessagesTypeAdapter.dump_python([response], mode="json")[0]
+
+
+def _load_response(data: Any) -> ModelResponse:
+    return ModelMessagesTypeAdapter.validate_python([data])[0]
+
+
+class RecordingModel(WrapperModel):
+    def __init__(self, wrapped, agent_name: str, cassette: Cassette):
+        super().__init__(wrapped)
+        self.agent_name = agent_name
+        self.cassette = cassette
+
+    async def request(self, messages, *args, **kwargs):
+        start = time.perf_counter()
+        result = await super().request(messages, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+        # Older pydantic-ai returns (response, usage)
+        response = result[0] if isinstance(result, tuple) else result
+        self.cassette.put(_messages_key(self.agent_name, messages), _dump_response(response), elapsed)
+        self.cassette.record_timing(f"model:{self.agent_name}", elapsed)
+        return result
+
+
+def replay_model(agent_name: str, cassette: Cassette) -> FunctionModel:
+    async def respond(messages, info: AgentInfo) -> ModelResponse:
+        start = time.perf_counter()
+        entry = cassette.take(_messages_key(agent_name, messages))
+        delay = cassette.replay_delay(entry)
+        if delay:
+            await asyncio.sleep(delay)
+        response = _load_response(entry["payload"])
+        cassette.record_timing(f"model:{agent_name}", time.perf_counter() - start)
+        return response
+    return FunctionModel(respond)
+
+
+@contextmanager
+def use_cassette(cassette: Cassette, agents: Dict[str, Any]):
+    """Route the given agents' models (and all recorded tools) through the cassette.
+
+    Agent models are swapped by attribute rather than Agent.override() so the swap
+    is visible to child agents run from tool threads.
+    """
+    global _active
+    originals = {name: agent.model for name, agent in agents.items()}
+    for name, agent in agents.items():
+        if cassette.mode == "record":
+            agent.model = RecordingModel(agent.model, name, cassette)
+        else:
+            agent.model = replay_model(name, cassette)
+    _active = cassette
+    try:
+        yield cassette
+    finally:
+        _active = None
+        for name, agent in agents.items():
+            agent.model = originals[name]
+        if cassette.mode == "record":
+            cassette.save()
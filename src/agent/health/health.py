@@ -3,6 +3,8 @@ from typing import List, Optional
 import json, os
 from pydantic import BaseModel
 from pydantic_ai import Agent, RunContext
+from .meal_catalog import MealCandidates, load_catalog
+from agent.cassette import recorded_tool
 
 class UserProfile(BaseModel):
     diet: Optional[str] = None          # e.g., "vegan", "keto", "vegetarian"
@@ -15,6 +17,7 @@ class UserProfile(BaseModel):
 @dataclass
 class HealthDeps:
     profile_file: str  # path to JSON file storing the profile
+    catalog_file: str = "data/meals.json"  # local meal catalog used by get_meal_candidates
 
 def _load_profile(path: str) -> UserProfile:
     if not os.path.exists(path):
@@ -38,8 +41,11 @@ health_agent = Agent[HealthDeps, HealthAnswer](
     instructions="""
     You are a health and nutrition assistant.
     - Read/update the user's health profile (diet, allergies, dislikes, calories).
-    - Suggest 3 dish ideas aligned with the profile.
-    - Avoid allergens/dislikes; align with diet. If info is missing, ask clarifying questions.
+    - For dish ideas, call get_meal_candidates and pick 3 from the returned meals; they are
+      already filtered for the profile's allergies, dislikes, diet and calories, except for
+      anything listed in unindexed_allergies or unmatched_dislikes, which you must check yourself.
+    - Only suggest dishes outside the candidates if none fit, and then avoid allergens/dislikes.
+      If info is missing, ask clarifying questions.
     - Suggest personalised diet plans if requested.
     - Keep answers concise.
     """,
@@ -48,7 +54,11 @@ health_agent = Agent[HealthDeps, HealthAnswer](
 
 @health_agent.tool(name="get_profile")
 def get_profile(ctx: RunContext[HealthDeps]) -> UserProfile:
-    return _load_profile(ctx.deps.profile_file)
+    return _get_profile(ctx.deps.profile_file)
+
+@recorded_tool("get_profile", UserProfile)
+def _get_profile(profile_file: str) -> UserProfile:
+    return _load_profile(profile_file)
 
 @health_agent.tool(name="update_profile")
 def update_profile(
@@ -58,7 +68,17 @@ def update_profile(
     dislikes: Optional[List[str]] = None,
     calories_target: Optional[int] = None,
 ) -> UserProfile:
-    profile = _load_profile(ctx.deps.profile_file)
+    return _update_profile(ctx.deps.profile_file, diet, allergies, dislikes, calories_target)
+
+@recorded_tool("update_profile", UserProfile)
+def _update_profile(
+    profile_file: str,
+    diet: Optional[str],
+    allergies: Optional[List[str]],
+    dislikes: Optional[List[str]],
+    calories_target: Optional[int],
+) -> UserProfile:
+    profile = _load_profile(profile_file)
     if diet is not None:
         profile.diet = diet
     if allergies is not None:
@@ -67,5 +87,11 @@ def update_profile(
         profile.dislikes = dislikes
     if calories_target is not None:
         profile.calories_target = calories_target
-    _save_profile(ctx.deps.profile_file, profile)
-    return profile
\ No newline at end of file
+    _save_profile(profile_file, profile)
+    return profile
+
+@health_agent.tool(name="get_meal_candidates")
+def get_meal_candidates(ctx: RunContext[HealthDeps], meal: Optional[str] = None) -> MealCandidates:
+    """Pre-filtered meals matching the user's profile. meal: breakfast, lunch, dinner or snack."""
+    profile = _load_profile(ctx.deps.profile_file)
+    return load_catalog(ctx.deps.catalog_file).candidates(profile, meal=meal)
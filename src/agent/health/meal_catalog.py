@@ -0,0 +1,171 @@
+import json
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+from pydantic import BaseModel
+
+class Meal(BaseModel):
+    id: str
+    name: str
+    meal: str                  # breakfast / lunch / dinner / snack
+    ingredients: List[str]
+    allergens: List[str]       # canonical names, see ALLERGEN_ALIASES
+    diet_tags: List[str]       # e.g., "vegan", "gluten-free", "keto"
+    calories: int
+
+class MealCandidates(BaseModel):
+    meals: List[Meal]
+    excluded_allergens: List[str]
+    unindexed_allergies: List[str] = []  # allergies the catalog can't filter on; the model must handle these
+    unmatched_dislikes: List[str] = []   # dislikes the catalog can't filter on; the model must handle these
+    diet_filter_applied: bool = True
+
+# Free-text allergy/dislike terms -> every canonical allergen key (data/meals.json) they cover.
+# Umbrella terms must list all of them: excluding only part of an allergy is unsafe.
+ALLERGEN_ALIASES = {
+    "gluten": ("gluten",), "wheat": ("gluten",), "celiac": ("gluten",), "coeliac": ("gluten",),
+    "peanut": ("peanut",), "groundnut": ("peanut",),
+    "nut": ("tree-nut", "peanut"),
+    "tree nut": ("tree-nut",), "tree-nut": ("tree-nut",), "almond": ("tree-nut",),
+    "walnut": ("tree-nut",), "cashew": ("tree-nut",), "pine nut": ("tree-nut",),
+    "dairy": ("dairy",), "milk": ("dairy",), "lactose": ("dairy",), "cheese": ("dairy",),
+    "egg": ("egg",),
+    "soy": ("soy",), "soya": ("soy",),
+    "fish": ("fish",),
+    "shellfish": ("shellfish",), "shrimp": ("shellfish",), "prawn": ("shellfish",), "crab": ("shellfish",),
+    "seafood": ("fish", "shellfish"),
+    "sesame": ("sesame",),
+}
+
+CALORIE_BAND = 200  # kcal per band
+LOW_CALORIE_MAX = 450
+
+def _norm(term: str) -> str:
+    term = re.sub(r"\s+", " ", term.strip().lower())
+    # Crude singularisation so "peanuts"/"tomatoes"/"berries" match "peanut"/"tomato"/"berry"
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 4 and term.endswith(("oes", "ches", "shes", "xes", "sses")):
+        return term[:-2]
+    if len(term) > 3 and term.endswith("s") and not term.endswith(("ss", "us")):
+        return term[:-1]
+    return term
+
+def _tokens(ingredient: str) -> Set[str]:
+    words = [_norm(w) for w in ingredient.split()]
+    return set(words) | {_norm(ingredient)}
+
+class MealCatalog:
+    """Local meal catalog with inverted indexes on allergens, ingredients, diet tags and calorie bands.
+
+    Allergen and dislike filtering is a set lookup, so what the health agent sees is
+    already safe for the profile; the model only ranks and phrases.
+    """
+
+    def __init__(self, meals: List[Meal]):
+        self.meals: Dict[str, Meal] = {m.id: m for m in meals}
+        self.by_allergen: Dict[str, Set[str]] = {}
+        self.by_ingredient: Dict[str, Set[str]] = {}
+        self.by_diet: Dict[str, Set[str]] = {}
+        self.by_calorie_band: Dict[int, Set[str]] = {}
+        for m in meals:
+            for allergen in m.allergens:
+                self.by_allergen.setdefault(allergen, set()).add(m.id)
+            for ingredient in m.ingredients:
+                for token in _tokens(ingredient):
+                    self.by_ingredient.setdefault(token, set()).add(m.id)
+            tags = {_norm(t) for t in m.diet_tags}
+            # Implied tags, so e.g. a pescatarian profile also sees the vegetarian meals
+            if "vegan" in tags:
+                tags.add("vegetarian")
+            if "vegetarian" in tags:
+                tags.add("pescatarian")
+            if m.calories <= LOW_CALORIE_MAX:
+                tags.add("low-calorie")
+            for tag in tags:
+                self.by_diet.setdefault(tag, set()).add(m.id)
+            self.by_calorie_band.setdefault(m.calories // CALORIE_BAND, set()).add(m.id)
+        self._cache: Dict[tuple, MealCandidates] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> "MealCatalog":
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls([Meal(**m) for m in data["meals"]])
+
+    def _allergens_for(self, term: str) -> tuple:
+        return ALLERGEN_ALIASES.get(_norm(term), ())
+
+    def _matching(self, term: str) -> Optional[Set[str]]:
+        """Meal ids hit by an allergy/dislike term, or None if the catalog doesn't know the term."""
+        key = _norm(term)
+        allergens = self._allergens_for(term)
+        hits: Optional[Set[str]] = None
+        if allergens:
+            hits = set().union(*(self.by_allergen.get(a, set()) for a in allergens))
+        if key in self.by_ingredient:
+            hits = (hits or set()) | self.by_ingredient[key]
+        return hits
+
+    def candidates(self, profile, meal: Optional[str] = None, limit: int = 8) -> MealCandidates:
+        # The profile JSON is the version: any update_profile produces a new key
+        key = (profile.model_dump_json(), meal, limit)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        ids = set(self.meals)
+        if meal:
+            ids = {i for i in ids if self.meals[i].meal == meal.strip().lower()}
+        excluded: List[str] = []
+        unindexed: List[str] = []
+        for allergy in profile.allergies:
+            hits = self._matching(allergy)
+            if hits is None:
+                unindexed.append(allergy)
+                continue
+            ids -= hits
+            excluded.extend(self._allergens_for(allergy) or (_norm(allergy),))
+        unmatched: List[str] = []
+        for dislike in profile.dislikes:
+            hits = self._matching(dislike)
+            if hits is None:
+                unmatched.append(dislike)
+            else:
+                ids -= hits
+
+        diet_applied = True
+        if profile.diet:
+            diet_ids = self.by_diet.get(_norm(profile.diet))
+            if diet_ids is None:
+                diet_applied = False
+            else:
+                ids &= diet_ids
+
+        if profile.calories_target:
+            # Per-meal budget of roughly a third of the daily target
+            budget = profile.calories_target // 3
+            ids &= set().union(*(v for band, v in self.by_calorie_band.items() if band <= budget // CALORIE_BAND))
+            ids = {i for i in ids if self.meals[i].calories <= budget}
+
+        meals = sorted((self.meals[i] for i in ids), key=lambda m: (-m.calories, m.id))
+        result = MealCandidates(
+            meals=meals[:limit],
+            excluded_allergens=sorted(set(excluded)),
+            unindexed_allergies=unindexed,
+            unmatched_dislikes=unmatched,
+            diet_filter_applied=diet_applied,
+        )
+        with self._lock:
+            if len(self._cache) >= 256:
+                self._cache.clear()
+            self._cache[key] = result
+        return result
+
+@lru_cache(maxsize=None)
+def load_catalog(path: str) -> MealCatalog:
+    return MealCatalog.from_file(path)
@@ -1,12 +1,14 @@
 from dataclasses import dataclass
-from typing import Literal, List
+from typing import Literal, List, Optional
 from pydantic import BaseModel
 from pydantic_ai import Agent, RunContext
 from langchain_community.vectorstores import FAISS
 
 # Child agents
 from agent.rag.rag_agent import rag_agent, RAGDeps
+from agent.rag.collection_registry import CollectionRegistry
 from agent.health.health import health_agent, HealthDeps
+from agent.singleflight import normalize_key, orchestrator_flight
 
 class DocChunk(BaseModel):
     id: str
@@ -14,8 +16,9 @@ class DocChunk(BaseModel):
 
 @dataclass
 class OrchestratorDeps:
-    vector_db: FAISS
+    vector_db: Optional[FAISS]
     profile_file: str # e.g., "data/user_profile.json"
+    collections: Optional[CollectionRegistry] = None
 
 class OrchestratorAnswer(BaseModel):
     answer: str
@@ -56,11 +59,29 @@ orchestrator_agent = Agent[OrchestratorDeps, OrchestratorAnswer](
 @orchestrator_agent.tool(name="ask_rag")
 def ask_rag(ctx: RunContext[OrchestratorDeps], question: str) -> str:
     """Query the RAG documentation agent."""
-    res = rag_agent.run_sync(question, deps=RAGDeps(vector_db=ctx.deps.vector_db))
+    res = rag_agent.run_sync(question, deps=RAGDeps(vector_db=ctx.deps.vector_db, collections=ctx.deps.collections))
     return getattr(res, "answer", str(res))
 
 @orchestrator_agent.tool(name="ask_health")
 def ask_health(ctx: RunContext[OrchestratorDeps], question: str) -> str:
     """Query the health/nutrition agent."""
     res = health_agent.run_sync(question, deps=HealthDeps(profile_file=ctx.deps.profile_file))
-    return getattr(res, "answer", str(res))
\ No newline at end of file
+    return getattr(res, "answer", str(res))
+
+def _flight_key(question: str, deps: OrchestratorDeps):
+    return (id(deps.vector_db), id(deps.collections), deps.profile_file, normalize_key(question))
+
+def ask_orchestrator(question: str, deps: OrchestratorDeps) -> OrchestratorAnswer:
+    """Run the orchestrator, sharing one in-flight run between identical concurrent questions."""
+    def run() -> OrchestratorAnswer:
+        run_result = orchestrator_agent.run_sync(question, deps=deps)
+        return run_result.output if hasattr(run_result, 'output') else run_result
+    return orchestrator_flight.do(_flight_key(question, deps), run)
+
+async def ask_orchestrator_async(question: str, deps: OrchestratorDeps) -> OrchestratorAnswer:
+    """Async ask_orchestrator for callers already on an event loop (batch.py); cancelling the
+    last waiter cancels the shared run."""
+    async def run() -> OrchestratorAnswer:
+        run_result = await orchestrator_agent.run(question, deps=deps)
+        return run_result.output if hasattr(run_result, 'output') else run_result
+    return await orchestrator_flight.do_async(_flight_key(question, deps), run)
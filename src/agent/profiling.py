@@ -0,0 +1,286 @@
+"""
+Opt-in hot-path profiling for the local (non-LLM) overhead of a request.
+
+Enable with `--profile` on main.py / evaluation.py, or SBA_PROFILE=1. While a
+selected request runs, a sampler thread snapshots the stacks of busy threads
+(the orchestrator and child agents run on worker threads, so these can't be
+pinned to one ident) and tracemalloc records allocations. Threads parked in a
+wait/lock/select frame, and threads running a request that was not selected,
+are left out. The sampler also watches traced memory and re-snapshots it as a
+request's usage climbs, so memory allocated and freed again within the request
+shows up at its peak. At the end of the run two files are written to SBA_PROFILE_DIR:
+
+    profile_<ts>.collapsed  flame-graph input (flamegraph.pl / speedscope / inferno)
+    alloc_<ts>.txt          per-request peaks, then top-N allocations by module and by
+                            source line, at the request peak and retained at its end
+
+SBA_PROFILE_SAMPLE_RATE (0..1, default 1) profiles only a fraction of requests;
+SBA_PROFILE_INTERVAL_MS sets the sampling interval (default 5ms).
+"""
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def _module_of(frame) -> str:
+    return frame.f_globals.get("__name__", "?")
+
+
+# The profiler's own bookkeeping (sample stacks, snapshots) is not the workload. Skipped
+# when snapshots are compared: Snapshot.filter_traces is far slower than taking one
+_OWN_FILES = frozenset(os.path.abspath(f) for f in (__file__, tracemalloc.__file__))
+
+# Take a new peak snapshot once traced memory has grown this much past the last one
+_PEAK_STEP_BYTES = 256 * 1024
+
+
+class _RequestTrace:
+    """Allocation state of one profiled request."""
+
+    def __init__(self):
+        self.before = tracemalloc.take_snapshot()
+        self.start_bytes = tracemalloc.get_traced_memory()[0]
+        self.peak_bytes = self.start_bytes
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_bytes = self.start_bytes
+
+
+# Leaf frames of threads that are blocked rather than working (pool workers waiting
+# for a task, joins, an idle event loop); sampling them only adds noise
+_IDLE_LEAVES = frozenset({
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("queue", "get"),
+    ("selectors", "select"),
+    ("concurrent.futures.thread", "_worker"),
+})
+
+
+class Profiler:
+    def __init__(
+        self,
+        out_dir: str = "profiles",
+        sample_rate: float = 1.0,
+        interval: float = 0.005,
+        top_n: int = 25,
+        nframes: int = 25,
+    ):
+        self.out_dir = out_dir
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.top_n = top_n
+        self.nframes = nframes
+        self.stacks: Counter = Counter()
+        self.alloc_by_module: Counter = Counter()      # retained at request end
+        self.alloc_by_line: Counter = Counter()
+        self.peak_by_module: Counter = Counter()       # live at the request's sampled peak
+        self.peak_by_line: Counter = Counter()
+        self.request_peaks_kb: List[float] = []
+        self.requests = 0
+        self.profiled = 0
+        self._lock = threading.Lock()
+        self._active = 0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._owns_tracemalloc = False
+        self._file_modules: Dict[str, str] = {}
+        self._modules_seen = 0
+        self._unselected: Counter = Counter()  # thread ident -> unselected requests running on it
+        self._traces: List[_RequestTrace] = []
+
+    # --- sampling -------------------------------------------------------
+
+    def _sample_loop(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                skip = set(self._unselected)
+                traces = list(self._traces)
+            skip.add(me)
+            if traces:
+                self._watch_peak(traces)
+            for ident, frame in frames.items():
+                if ident in skip or (_module_of(frame), frame.f_code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{_module_of(frame)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def _watch_peak(self, traces: List[_RequestTrace]) -> None:
+        current = tracemalloc.get_traced_memory()[0]
+        due = []
+        for trace in traces:
+            trace.peak_bytes = max(trace.peak_bytes, current)
+            # Snapshots cost time proportional to live allocations; only take one on real growth
+            step = max(_PEAK_STEP_BYTES, (trace.snapshot_bytes - trace.start_bytes) // 4)
+            if current >= trace.snapshot_bytes + step:
+                due.append(trace)
+        if not due:
+            return
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            for trace in due:
+                trace.peak_snapshot, trace.snapshot_bytes = snapshot, current
+
+    def _start_sampling(self) -> None:
+        with self._lock:
+            self._active += 1
+            if self._active > 1:
+                return
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.nframes)
+                self._owns_tracemalloc = True
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+
+    def _stop_sampling(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active:
+                return
+            self._stop.set()
+            sampler, self._sampler = self._sampler, None
+            if self._owns_tracemalloc:
+                # Tracing slows every allocation; keep it off between profiled requests
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+        sampler.join()
+
+    # --- allocations ----------------------------------------------------
+
+    def _module_for_file(self, filename: str) -> str:
+        path = os.path.abspath(filename)
+        if path not in self._file_modules and len(sys.modules) != self._modules_seen:
+            self._modules_seen = len(sys.modules)
+            for name, module in list(sys.modules.items()):
+                module_file = getattr(module, "__file__", None)
+                if module_file:
+                    self._file_modules[os.path.abspath(module_file)] = name
+        return self._file_modules.get(path, os.path.basename(filename))
+
+    def _add_growth(self, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot,
+                    by_module: Counter, by_line: Counter) -> None:
+        for stat in after.compare_to(before, "lineno"):
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            if os.path.abspath(frame.filename) in _OWN_FILES:
+                continue
+            by_module[self._module_for_file(frame.filename)] += stat.size_diff
+            by_line[f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+
+    def _record_allocations(self, trace: _RequestTrace, after: tracemalloc.Snapshot, peak_bytes: int) -> None:
+        with self._lock:
+            peak_bytes = max(trace.peak_bytes, peak_bytes)
+            self.request_peaks_kb.append((peak_bytes - trace.start_bytes) / 1024)
+            self._add_growth(trace.before, trace.peak_snapshot or after, self.peak_by_module, self.peak_by_line)
+            self._add_growth(trace.before, after, self.alloc_by_module, self.alloc_by_line)
+
+    # --- public API -----------------------------------------------------
+
+    @contextmanager
+    def request(self):
+        """Profile the enclosed request if it is selected by the sample rate."""
+        with self._lock:
+            self.requests += 1
+            selected = random.random() < self.sample_rate
+            if selected:
+                self.profiled += 1
+        if not selected:
+            # Keep a concurrent selected request's sampler off this thread
+            ident = threading.get_ident()
+            with self._lock:
+                self._unselected[ident] += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._unselected[ident] -= 1
+                    if not self._unselected[ident]:
+                        del self._unselected[ident]
+            return
+
+        self._start_sampling()
+        with self._lock:
+            if not self._traces:
+                # Peak since the earliest live profiled request began; exact unless requests overlap
+                tracemalloc.reset_peak()
+            trace = _RequestTrace()
+            self._traces.append(trace)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._traces.remove(trace)
+            after = tracemalloc.take_snapshot()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            self._stop_sampling()
+            self._record_allocations(trace, after, peak_bytes)
+
+    def write_reports(self) -> List[str]:
+        if not self.profiled:
+            return []
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        collapsed = os.path.join(self.out_dir, f"profile_{stamp}.collapsed")
+        with open(collapsed, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        report = os.path.join(self.out_dir, f"alloc_{stamp}.txt")
+        with open(report, "w") as f:
+            f.write(f"Profiled requests: {self.profiled}/{self.requests}\n")
+            f.write(f"Samples: {sum(self.stacks.values())} @ {self.interval * 1000:.1f}ms\n")
+            f.write("Note: tracemalloc is process-wide, so allocations made by other threads while a\n"
+                    "profiled request ran (concurrent unselected requests, background work) are\n"
+                    "included; worker threads of unselected requests may also appear in the samples.\n"
+                    "The peak KB figure is exact unless profiled requests overlap; the breakdown at the\n"
+                    "peak comes from the snapshot the sampler took closest to it.\n\n")
+            peaks = self.request_peaks_kb
+            f.write(f"Request peak above start: mean {sum(peaks) / len(peaks):.1f} KB, max {max(peaks):.1f} KB\n\n")
+            sections = [
+                ("by module, KB live at each request's sampled peak", self.peak_by_module),
+                ("by line, KB live at each request's sampled peak", self.peak_by_line),
+                ("by module, net KB retained at request end", self.alloc_by_module),
+                ("by line, net KB retained at request end", self.alloc_by_line),
+            ]
+            for title, counter in sections:
+                f.write(f"Top {self.top_n} allocations {title}\n")
+                for key, size in counter.most_common(self.top_n):
+                    f.write(f"  {size / 1024:>12.1f}  {key}\n")
+                f.write("\n")
+        return [collapsed, report]
+
+
+def profiler_from_env(argv: Optional[List[str]] = None) -> Optional[Profiler]:
+    """A Profiler when `--profile` is in argv (removed from it) or SBA_PROFILE is set, else None."""
+    argv = sys.argv if argv is None else argv
+    flag = "--profile" in argv
+    if flag:
+        argv.remove("--profile")
+    if not flag and os.getenv("SBA_PROFILE", "").lower() not in ("1", "true", "yes"):
+        return None
+    return Profiler(
+        out_dir=os.getenv("SBA_PROFILE_DIR", "profiles"),
+        sample_rate=float(os.getenv("SBA_PROFILE_SAMPLE_RATE", "1")),
+        interval=float(os.getenv("SBA_PROFILE_INTERVAL_MS", "5")) / 1000,
+    )
+
+
+@contextmanager
+def maybe_profile(profiler: Optional[Profiler]):
+    if profiler is None:
+        yield
+    else:
+        with profiler.request():
+            yield
@@ -0,0 +1,127 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from .vector_store import load_vectorstore
+
+class _Shard:
+    def __init__(self, store):
+        self.store = store
+        self.in_flight = 0
+        self.retired = False
+
+class CollectionRegistry:
+    """Named index shards (product docs, runbooks, notes, ...) searched in parallel.
+
+    Each shard is any store exposing `similarity_search_with_relevance_scores`
+    (LangChain FAISS or MmapVectorStore), so shards can use different index types and
+    are merged on the same 0..1 relevance scale. A replaced or unloaded shard is
+    closed only once the searches already running on it have finished.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._shards: Dict[str, _Shard] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard-search")
+
+    def _retire(self, shard: Optional[_Shard]) -> None:
+        # Caller holds the lock
+        if shard is None:
+            return
+        shard.retired = True
+        if shard.in_flight == 0:
+            _close(shard.store)
+
+    def register(self, name: str, store) -> None:
+        with self._lock:
+            old = self._shards.get(name)
+            self._shards[name] = _Shard(store)
+            if old is not None and old.store is not store:
+                self._retire(old)
+
+    def load(self, name: str, docs_path: str, index_dir: Optional[str] = None) -> None:
+        # Build outside the lock so searches on other shards keep running; with index_dir
+        # set, load_vectorstore rebuilds the on-disk store when docs_path has changed
+        self.register(name, load_vectorstore(docs_path, index_dir))
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            self._retire(self._shards.pop(name, None))
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._shards)
+
+    def _search_shard(self, shard: _Shard, query: str, k: int) -> List[Tuple[Document, float]]:
+        try:
+            return shard.store.similarity_search_with_relevance_scores(query, k=k)
+        finally:
+            with self._lock:
+                shard.in_flight -= 1
+                if shard.retired and shard.in_flight == 0:
+                    _close(shard.store)
+
+    def search(self, query: str, k: int = 3, names: Optional[Iterable[str]] = None) -> List[Tuple[Document, float]]:
+        """Global top-k across the named shards; None or an empty selection searches all of them."""
+        names = list(names) if names is not None else []
+        with self._lock:
+            if not names:
+                shards = dict(self._shards)
+            else:
+                shards = {n: self._shards[n] for n in names if n in self._shards}
+            for shard in shards.values():
+                shard.in_flight += 1
+        if not shards:
+            return []
+
+        futures = {
+            name: self._pool.submit(self._search_shard, shard, query, k)
+            for name, shard in shards.items()
+        }
+        merged: List[Tuple[Document, float]] = []
+        for name, future in futures.items():
+            for doc, score in future.result():
+                # Tag a copy: an in-heap FAISS store hands out its own docstore objects
+                metadata = {"collection": name, **doc.metadata}
+                merged.append((Document(page_content=doc.page_content, metadata=metadata), score))
+        merged.sort(key=lambda hit: hit[1], reverse=True)
+        return merged[:k]
+
+    def close(self) -> None:
+        with self._lock:
+            shards, self._shards = self._shards, {}
+            for shard in shards.values():
+                self._retire(shard)
+        self._pool.shutdown(wait=False)
+
+def _close(store) -> None:
+    close = getattr(store, "close", None)
+    if close is not None:
+        close()
+
+def registry_from_spec(spec: str, index_root: Optional[str] = None) -> CollectionRegistry:
+    """Build a registry from "name=path,name=path" (e.g. the RAG_COLLECTIONS env var).
+
+    With `index_root` set, each collection is stored memory-mapped under `index_root/<name>`.
+    """
+    registry = CollectionRegistry()
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, docs_path = entry.partition("=")
+        if not docs_path:
+            raise ValueError(f"Invalid collection entry {entry!r}, expected name=path")
+        index_dir = os.path.join(index_root, name.strip()) if index_root else None
+        registry.load(name.strip(), docs_path.strip(), index_dir)
+    return registry
+
+def load_retrieval_from_env(docs_path: str) -> Tuple[Optional[object], Optional[CollectionRegistry]]:
+    """(vector_db, collections) for the deps, from RAG_COLLECTIONS / VECTOR_STORE_DIR."""
+    spec = os.getenv("RAG_COLLECTIONS")
+    if spec:
+        return None, registry_from_spec(spec, os.getenv("VECTOR_STORE_DIR"))
+    return load_vectorstore(docs_path, os.getenv("VECTOR_STORE_DIR")), None
@@ -1,9 +1,12 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from pydantic_ai import Agent, RunContext
 from pydantic import BaseModel
 from langchain_community.vectorstores import FAISS
 from ddgs import DDGS 
+from .collection_registry import CollectionRegistry
+from agent.singleflight import normalize_key, search_docs_flight, web_search_flight
+from agent.cassette import recorded_tool
 
 # PydanticAI chunk format
 class DocChunk(BaseModel):
@@ -12,7 +15,8 @@ class DocChunk(BaseModel):
 
 @dataclass
 class RAGDeps:
-    vector_db: FAISS
+    vector_db: Optional[FAISS] = None
+    collections: Optional[CollectionRegistry] = None  # sharded retrieval; takes precedence over vector_db
 
 
 class RAGAnswer(BaseModel):
@@ -35,17 +39,36 @@ rag_agent = Agent[RAGDeps, RAGAnswer](
     model_settings={"tool_choice": "auto"},
 )
 
+@rag_agent.instructions
+def available_collections(ctx: RunContext[RAGDeps]) -> str:
+    if ctx.deps.collections is None:
+        return ""
+    names = ", ".join(ctx.deps.collections.names())
+    return f"`search_docs` accepts an optional `collections` list to narrow the search. Available: {names}."
 
 # Retrieval tool using FAISS similarity search
 @rag_agent.tool
-def search_docs(ctx: RunContext[RAGDeps], query: str) -> List[DocChunk]:
-    results = ctx.deps.vector_db.similarity_search_with_score(query, k=3)
+def search_docs(ctx: RunContext[RAGDeps], query: str, collections: Optional[List[str]] = None) -> List[DocChunk]:
+    collections = collections or None  # an empty selection from the model means "all"
+    store = ctx.deps.collections if ctx.deps.collections is not None else ctx.deps.vector_db
+    key = (id(store), normalize_key(query), tuple(sorted(collections or ())))
+    return list(search_docs_flight.do(key, lambda: _search_docs(ctx.deps, query, collections)))
+
+@recorded_tool("search_docs", List[DocChunk], skip_args=1)
+def _search_docs(deps: RAGDeps, query: str, collections: Optional[List[str]]) -> List[DocChunk]:
+    if deps.collections is not None:
+        results = deps.collections.search(query, k=3, names=collections)
+    else:
+        results = deps.vector_db.similarity_search_with_score(query, k=3)
 
     chunks = []
     for doc, score in results:
+        source = doc.metadata.get("source", "unknown")
+        collection = doc.metadata.get("collection")
         chunks.append(
             DocChunk(
-                id=doc.metadata.get("source", "unknown"),
+                # Prefixed with the shard so hits from different collections stay distinguishable
+                id=f"{collection}:{source}" if collection else source,
                 text=doc.page_content,
             )
         )
@@ -54,6 +77,10 @@ def search_docs(ctx: RunContext[RAGDeps], query: str) -> List[DocChunk]:
 # Web search tool using DuckDuckGo
 @rag_agent.tool(name="web_search")
 def web_search(ctx: RunContext[RAGDeps], query: str) -> List[DocChunk]:
+    return list(web_search_flight.do(normalize_key(query), lambda: _web_search(query)))
+
+@recorded_tool("web_search", List[DocChunk])
+def _web_search(query: str) -> List[DocChunk]:
     chunks: List[DocChunk] = []
     with DDGS() as ddgs:
         for r in ddgs.text(query, max_results=3):
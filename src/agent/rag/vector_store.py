@@ -1,10 +1,194 @@
-# ...existing code...
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
+from .rag_loader import load_and_split_markdown
+
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+DOCSTORE_FILE = "docstore.sqlite"
+MANIFEST_FILE = "manifest.json"  # written last; its presence means the store is complete
+LOCK_FILE = ".build.lock"
+
+@lru_cache(maxsize=None)
+def _embeddings():
+    # Use an open-source embedding model instead of OpenAI; shared by every store in the process
+    return HuggingFaceEmbeddings(model_name="nomic-ai/nomic-embed-text-v1.5",
+                                 model_kwargs={"trust_remote_code": True})
+
 def create_vectorstore(docs):
-    # Use an open-source embedding model instead of OpenAI
-    embeddings = HuggingFaceEmbeddings(model_name="nomic-ai/nomic-embed-text-v1.5",
-                                        model_kwargs={"trust_remote_code": True})
-    return FAISS.from_documents(docs, embeddings)
-# ...existing code...
\ No newline at end of file
+    return FAISS.from_documents(docs, _embeddings())
+
+def _docs_hash(docs_path: str) -> str:
+    with open(docs_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _replace_into(index_dir: str, name: str, write) -> None:
+    # Write beside the target, then atomically swap it in; readers never see a partial file
+    tmp = os.path.join(index_dir, f".{name}.{os.getpid()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, os.path.join(index_dir, name))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def save_vectorstore(vector_db: FAISS, index_dir: str, docs_hash: Optional[str] = None) -> None:
+    """Export a FAISS store as raw .npy vectors plus a SQLite docstore keyed by index position.
+
+    IO_FLAG_MMAP only maps IVF inverted lists, so a flat index read through faiss would
+    still be copied onto every worker's heap; plain .npy files can be mapped as-is.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    # Invalidate first: a crash part-way through leaves the store incomplete, so it gets rebuilt
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    index = vector_db.index
+    vectors = np.ascontiguousarray(index.reconstruct_n(0, index.ntotal), dtype=np.float32)
+
+    def write_array(array):
+        def write(path):
+            with open(path, "wb") as f:
+                np.save(f, array)
+        return write
+    _replace_into(index_dir, VECTORS_FILE, write_array(vectors))
+    _replace_into(index_dir, NORMS_FILE, write_array(np.einsum("ij,ij->i", vectors, vectors)))
+
+    def write_docstore(path):
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("CREATE TABLE chunks (pos INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+            rows = []
+            for pos, doc_id in vector_db.index_to_docstore_id.items():
+                doc = vector_db.docstore.search(doc_id)
+                rows.append((pos, doc.page_content, json.dumps(doc.metadata)))
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+    _replace_into(index_dir, DOCSTORE_FILE, write_docstore)
+
+    manifest = {
+        "docs_sha256": docs_hash,
+        "metric": "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+        "count": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+    }
+    def write_manifest(path):
+        with open(path, "w") as f:
+            json.dump(manifest, f)
+    _replace_into(index_dir, MANIFEST_FILE, write_manifest)
+
+def _read_manifest(index_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+class MmapVectorStore:
+    """Read-only store: memory-mapped .npy vectors, chunks fetched from SQLite only for the top-k hits.
+
+    Worker processes opening the same directory share the vector pages through the OS page cache.
+    Search is the same exact scan IndexFlatL2/IndexFlatIP performs, done with numpy over the map.
+    """
+
+    def __init__(self, index_dir: str, embeddings=None):
+        manifest = _read_manifest(index_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"No complete vector store in {index_dir}")
+        self.metric = manifest["metric"]
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+        self.norms = np.load(os.path.join(index_dir, NORMS_FILE), mmap_mode="r")
+        self.embeddings = embeddings or _embeddings()
+        db_uri = f"file:{os.path.join(index_dir, DOCSTORE_FILE)}?mode=ro"
+        self._conn = sqlite3.connect(db_uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def _fetch(self, positions: List[int]) -> dict:
+        marks = ",".join("?" * len(positions))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT pos, text, metadata FROM chunks WHERE pos IN ({marks})", positions
+            ).fetchall()
+        return {pos: Document(page_content=text, metadata=json.loads(meta)) for pos, text, meta in rows}
+
+    def search_vector(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """(position, score) for the top-k rows; squared L2 distance or inner product, as faiss reports."""
+        n = self.vectors.shape[0]
+        if n == 0:
+            return []
+        k = min(k, n)
+        dots = self.vectors @ query
+        if self.metric == "ip":
+            scores = dots
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            scores = self.norms - 2 * dots + float(query @ query)
+            top = np.argpartition(scores, k - 1)[:k]
+            top = top[np.argsort(scores[top])]
+        return [(int(p), float(scores[p])) for p in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        hits = self.search_vector(vector, k)
+        if not hits:
+            return []
+        docs = self._fetch([p for p, _ in hits])
+        return [(docs[p], s) for p, s in hits if p in docs]
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        # LangChain FAISS's own conversion for the matching distance strategy, so an mmapped shard
+        # and an in-heap shard over the same index merge on one scale (for L2 and inner product)
+        if self.metric == "ip":
+            relevance = FAISS._max_inner_product_relevance_score_fn
+        else:
+            relevance = FAISS._euclidean_relevance_score_fn
+        return [(doc, relevance(score)) for doc, score in self.similarity_search_with_score(query, k)]
+
+    def close(self) -> None:
+        self._conn.close()
+
+def open_vectorstore(index_dir: str, embeddings=None) -> MmapVectorStore:
+    return MmapVectorStore(index_dir, embeddings)
+
+@contextmanager
+def _build_lock(index_dir: str):
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def load_vectorstore(docs_path: str, index_dir: Optional[str] = None):
+    """In-heap FAISS when no index_dir is given; otherwise (re)build the on-disk store as needed and mmap it.
+
+    The store is rebuilt when it is incomplete or was built from different docs. Workers
+    starting together serialise on a lock file, so only one builds and the rest reuse it.
+    """
+    if not index_dir:
+        return create_vectorstore(load_and_split_markdown(docs_path))
+    docs_hash = _docs_hash(docs_path)
+    with _build_lock(index_dir):
+        manifest = _read_manifest(index_dir)
+        if manifest is None or manifest.get("docs_sha256") != docs_hash:
+            save_vectorstore(create_vectorstore(load_and_split_markdown(docs_path)), index_dir, docs_hash)
+        # Opened under the lock so the files all come from one build; later rebuilds swap in
+        # new inodes with os.replace and never disturb this mapping
+        return open_vectorstore(index_dir)
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+def normalize_key(text: str) -> str:
+    """Case- and whitespace-insensitive key so trivially different phrasings coalesce."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class _AsyncCall:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight execution.
+
+    The first caller (the leader) runs the function; callers arriving while it is
+    in flight wait and receive the same result, or the same exception. Nothing is
+    cached: once the call finishes, the next caller runs it again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, _AsyncCall] = {}
+        self._requests = 0
+        self._executions = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            self._requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executions += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            logger.debug("%s: coalesced %r", self.name, key)
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async variant. A cancelled waiter only cancels the shared task if it was the last one waiting."""
+        with self._lock:
+            self._requests += 1
+            call = self._async_calls.get(key)
+            if call is None:
+                call = self._async_calls[key] = _AsyncCall(asyncio.ensure_future(fn()))
+                self._executions += 1
+                call.task.add_done_callback(lambda _: self._forget_async(key, call))
+            else:
+                logger.debug("%s: coalesced %r", self.name, key)
+            call.waiters += 1
+
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            with self._lock:
+                if call.waiters == 1:
+                    # Forget the key in the same step, so a caller arriving before the
+                    # done callback runs starts a fresh call instead of joining a cancelled one
+                    if self._async_calls.get(key) is call:
+                        del self._async_calls[key]
+                    call.task.cancel()
+            raise
+        finally:
+            with self._lock:
+                call.waiters -= 1
+
+    def _forget_async(self, key: Hashable, call: _AsyncCall) -> None:
+        with self._lock:
+            if self._async_calls.get(key) is call:
+                del self._async_calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests, executions = self._requests, self._executions
+        coalesced = requests - executions
+        return {
+            "requests": requests,
+            "executions": executions,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / requests, 3) if requests else 0.0,
+        }
+
+# Shared groups, one per coalesced entry point
+orchestrator_flight = SingleFlight("orchestrator")
+search_docs_flight = SingleFlight("search_docs")
+web_search_flight = SingleFlight("web_search")
+
+def coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    return {f.name: f.stats() for f in (orchestrator_flight, search_docs_flight, web_search_flight)}
+
+def format_coalescing_stats() -> str:
+    return " | ".join(
+        f"{name}: {s['coalesced']}/{s['requests']} coalesced ({s['coalescing_ratio']:.0%})"
+        for name, s in coalescing_stats().items()
+    )
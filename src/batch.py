@@ -0,0 +1,231 @@
+"""
+Offline batch runner: streams questions from a JSONL file through the orchestrator
+(or straight through rag_task) and appends one result per line to an output JSONL.
+
+Input lines look like {"id": "q1", "question": "..."}; "id" defaults to the line number.
+The output file doubles as the checkpoint: re-running with the same --output skips
+ids that already succeeded and retries the ones that failed. Lines that aren't valid
+JSON or lack a "question" are written as failed records and the run carries on.
+
+Usage:
+    python src/batch.py questions.jsonl --output answers.jsonl --concurrency 8 --rps 2
+"""
+import os, sys
+sys.path.append(os.path.dirname(__file__))  # add ./src
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, Iterator, Optional, Set
+
+from agent.rag.collection_registry import load_retrieval_from_env
+from agent.rag.rag_agent import RAGDeps
+from agent.rag.task import rag_task
+from agent.orchestrator.orchestrator import ask_orchestrator_async, OrchestratorDeps
+from agent.singleflight import format_coalescing_stats
+
+
+class RateLimiter:
+    """Spaces request starts at least 1/rps seconds apart (no limit when rps <= 0)."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def read_questions(path: str) -> Iterator[Dict[str, Any]]:
+    """Items from a JSONL file. Unparseable lines are yielded as {"id", "invalid"} rather than
+    raised, so one bad line fails only itself instead of aborting a long run."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                item = {"invalid": f"line {line_no} is not valid JSON: {e}"}
+            if not isinstance(item, dict):
+                item = {"invalid": f"line {line_no} is not a JSON object"}
+            item.setdefault("id", str(line_no))
+            yield item
+
+
+def malformed(item: Dict[str, Any]) -> Optional[str]:
+    """Why an input item can't be run, or None if it is fine."""
+    if "invalid" in item:
+        return item["invalid"]
+    question = item.get("question")
+    if not isinstance(question, str) or not question.strip():
+        return 'missing or empty "question"'
+    return None
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Ids that already have a successful result in the output file."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            if record.get("success"):
+                done.add(str(record["id"]))
+    return done
+
+
+async def run_one(question: str, mode: str, deps: OrchestratorDeps) -> Dict[str, Any]:
+    if mode == "rag":
+        rag_deps = RAGDeps(vector_db=deps.vector_db, collections=deps.collections)
+        out = await asyncio.to_thread(rag_task, question, rag_deps)
+        return {"answer": out["answer"], "source": "rag", "used_doc_ids": out["used_doc_ids"]}
+    # Native async run: cancelling the batch (Ctrl-C) cancels the agent run rather than
+    # leaving a worker thread to finish it, and duplicate questions share one run
+    result = await ask_orchestrator_async(question, deps)
+    return {"answer": result.answer, "source": result.source}
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    deps: OrchestratorDeps,
+    mode: str = "orchestrator",
+    concurrency: int = 4,
+    rps: float = 0.0,
+    max_retries: int = 3,
+    limit: Optional[int] = None,
+    backoff: float = 1.0,
+) -> Dict[str, Any]:
+    done = load_checkpoint(output_path)
+    limiter = RateLimiter(rps)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"processed": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        async def process(item: Dict[str, Any]) -> None:
+            try:
+                record: Dict[str, Any] = {"id": item["id"], "question": item.get("question")}
+                start = time.perf_counter()
+                problem = malformed(item)
+                if problem:
+                    # Not retried: the input won't change between attempts
+                    print(f"✗ {item['id']}: {problem}")
+                    record.update(success=False, error=problem, attempts=0)
+                else:
+                    for attempt in range(max(1, max_retries)):
+                        if attempt:
+                            # Exponential backoff so a rate-limited API isn't hit again immediately
+                            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+                        await limiter.wait()
+                        try:
+                            record.update(await run_one(item["question"], mode, deps))
+                            record.update(success=True, error=None)
+                            break
+                        except Exception as e:
+                            record.update(success=False, error=str(e))
+                    record["attempts"] = attempt + 1
+                record["latency_s"] = round(time.perf_counter() - start, 3)
+
+                # Single event loop thread: whole lines are written and flushed in order of completion
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                stats["processed"] += 1
+                stats["succeeded" if record["success"] else "failed"] += 1
+            finally:
+                semaphore.release()
+
+        def finished(task: asyncio.Task) -> None:
+            tasks.discard(task)
+            # Anything process() didn't turn into a record (e.g. a failed write) still counts
+            if not task.cancelled() and task.exception() is not None:
+                stats["failed"] += 1
+                print(f"✗ {task.get_name()}: {task.exception()!r}")
+
+        started = time.perf_counter()
+        tasks = set()
+        launched = 0
+        for item in read_questions(input_path):
+            if str(item["id"]) in done:
+                stats["skipped"] += 1
+                continue
+            if limit is not None and launched >= limit:
+                break
+            launched += 1
+            # Acquire before creating the task so the input is streamed, not loaded up front
+            await semaphore.acquire()
+            task = asyncio.create_task(process(item), name=str(item["id"]))
+            tasks.add(task)
+            task.add_done_callback(finished)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["throughput_qps"] = round(stats["processed"] / elapsed, 3) if elapsed > 0 else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL question set through the agents.")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"question\"} object per line")
+    parser.add_argument("--output", required=True, help="results JSONL; also the resume checkpoint")
+    parser.add_argument("--mode", choices=["orchestrator", "rag"], default="orchestrator")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rps", type=float, default=0.0, help="max request starts per second (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="seconds before the first retry, doubled each time")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many new items")
+    args = parser.parse_args()
+
+    vector_db, collections = load_retrieval_from_env("data/docs.md")
+    deps = OrchestratorDeps(
+        vector_db=vector_db,
+        profile_file="data/user_profile.json",
+        collections=collections,
+    )
+
+    try:
+        stats = asyncio.run(run_batch(
+            args.input, args.output, deps,
+            mode=args.mode,
+            concurrency=args.concurrency,
+            rps=args.rps,
+            max_retries=args.retries,
+            backoff=args.backoff,
+            limit=args.limit,
+        ))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Re-run with --output {args.output} to resume.")
+        return
+
+    print("\n" + "="*60)
+    print("BATCH SUMMARY")
+    print("="*60)
+    print(f"Processed: {stats['processed']} (skipped {stats['skipped']} already done)")
+    print(f"Succeeded: {stats['succeeded']}")
+    print(f"Failed: {stats['failed']}")
+    print(f"Elapsed: {stats['elapsed_s']}s | Throughput: {stats['throughput_qps']} q/s")
+    print(f"Coalescing: {format_coalescing_stats()}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,25 @@ import os, sys
 sys.path.append(os.path.dirname(__file__))  # add ./src
 from dotenv import load_dotenv
 load_dotenv()
-from agent.rag.rag_loader import load_and_split_markdown
-from agent.rag.vector_store import create_vectorstore
+from agent.rag.collection_registry import load_retrieval_from_env
 from agent.rag.rag_agent import RAGDeps
 from agent.rag.task import rag_task
-from agent.orchestrator.orchestrator import orchestrator_agent, OrchestratorDeps
+from agent.orchestrator.orchestrator import ask_orchestrator, OrchestratorDeps
+from agent.profiling import maybe_profile, profiler_from_env
+from agent.singleflight import format_coalescing_stats
 
 def main():
-    # Load markdown file
-    docs = load_and_split_markdown("data/docs.md")
+    # Opt-in hot-path profiling: `python src/main.py --profile` or SBA_PROFILE=1
+    profiler = profiler_from_env()
 
-    # Build FAISS vector DB
-    vector_db = create_vectorstore(docs)
+    # RAG_COLLECTIONS="docs=data/docs.md,runbooks=data/runbooks.md" searches one shard per collection;
+    # otherwise build a single FAISS vector DB (memory-mapped from VECTOR_STORE_DIR when set)
+    vector_db, collections = load_retrieval_from_env("data/docs.md")
 
     deps = OrchestratorDeps(
         vector_db=vector_db,
         profile_file="data/user_profile.json",
+        collections=collections,
     )
 
     # Chat loop
@@ -33,9 +36,8 @@ def main():
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    run_result = orchestrator_agent.run_sync(question, deps=deps)
-                    # The result is the OrchestratorAnswer object itself
-                    result = run_result.output if hasattr(run_result, 'output') else run_result
+                    with maybe_profile(profiler):
+                        result = ask_orchestrator(question, deps)
                     print(f"[{result.source}] {result.answer}\n")
                     break  # Success, exit retry loop
                 except Exception as e:
@@ -46,6 +48,11 @@ def main():
                         print("Please try rephrasing your question.\n")
     except KeyboardInterrupt:
         print("\nBye.")
+    finally:
+        print(f"Coalescing: {format_coalescing_stats()}")
+        if profiler is not None:
+            for path in profiler.write_reports():
+                print(f"Profile written to: {path}")
 
 if __name__ == "__main__": 
     main()
@@ -1,10 +1,13 @@
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, RunContext
 from dataclasses import dataclass
-from typing import Optional
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional
+from collections import deque
 from datetime import datetime
 import asyncio
 import os
+import statistics
+import sys
 from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
@@ -87,7 +90,195 @@ async def stock_price_stream(stock_symbol: str):
         )
         await asyncio.sleep(1)  # Simulate real-time delay
 
-# ===== 6. Real-Time Processing Function =====
+# ===== 6. Streaming Monitor Engine =====
+
+# Any async source of ticks for a symbol, e.g. stock_price_stream or a websocket feed
+PriceSource = Callable[[str], AsyncIterator[StockPrice]]
+
+@dataclass
+class TickResult:
+    tick: StockPrice
+    previous_price: float
+    change_percent: float               # change vs. the last analysed price
+    volatility: float                   # stdev of recent tick-to-tick % changes
+    alert: Optional[AlertOutput] = None
+    analysis: Optional[AnalysisOutput] = None
+    skipped: bool = False               # True when the pre-check decided no LLM call was needed
+    dropped_ticks: int = 0              # stale ticks coalesced away before this one
+    error: Optional[str] = None         # set when the agent calls failed for this tick
+
+class _LatestTick:
+    """One-slot mailbox: a new tick overwrites an unprocessed one, so a slow consumer never lags behind."""
+
+    def __init__(self):
+        self._tick: Optional[StockPrice] = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, tick: StockPrice) -> None:
+        if self._tick is not None:
+            self.dropped += 1
+        self._tick = tick
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def get(self) -> Optional[StockPrice]:
+        """Latest unprocessed tick, or None once the source is exhausted."""
+        while True:
+            if self.closed and self._tick is None:
+                return None  # close() may have set the event before the last tick was taken
+            await self._ready.wait()
+            tick, self._tick = self._tick, None
+            self._ready.clear()
+            if tick is not None:
+                return tick
+
+class StockMonitor:
+    """Follows many symbols concurrently and only calls the LLM agents for ticks that matter.
+
+    A tick goes to the agents when the move since the last analysed price reaches
+    `threshold`%, or the rolling volatility reaches `volatility_threshold`%;
+    everything else is answered deterministically. Both agents run concurrently
+    per tick, and `max_concurrent_llm` caps in-flight ticks across all symbols.
+    """
+
+    def __init__(
+        self,
+        symbols: List[str],
+        source: Optional[PriceSource] = None,
+        threshold: float = 5.0,
+        volatility_threshold: Optional[float] = None,
+        window: int = 5,
+        max_concurrent_llm: int = 4,
+        on_result: Optional[Callable[[TickResult], None]] = None,
+    ):
+        self.symbols = symbols
+        self.source = source or stock_price_stream
+        self.threshold = threshold
+        self.volatility_threshold = threshold if volatility_threshold is None else volatility_threshold
+        self.window = window
+        self.on_result = on_result or print_tick_result
+        self._llm_slots = asyncio.Semaphore(max_concurrent_llm)
+        self.stats = {"ticks": 0, "llm_ticks": 0, "skipped": 0, "dropped": 0, "errors": 0}
+        self.source_errors: Dict[str, str] = {}  # symbol -> why its price source stopped
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._follow(symbol) for symbol in self.symbols))
+
+    async def _follow(self, symbol: str) -> None:
+        mailbox = _LatestTick()
+
+        async def produce():
+            try:
+                async for tick in self.source(symbol):
+                    mailbox.put(tick)
+            finally:
+                mailbox.close()
+
+        producer = asyncio.create_task(produce())
+        try:
+            await self._consume(mailbox)
+        except BaseException:
+            producer.cancel()
+            raise
+        try:
+            await producer
+        except Exception as e:
+            # A failing feed ends only its own symbol; the others keep being monitored
+            self.source_errors[symbol] = f"{type(e).__name__}: {e}"
+            print(f"\n{symbol}: price source failed: {self.source_errors[symbol]}")
+
+    async def _consume(self, mailbox: _LatestTick) -> None:
+        reference: Optional[float] = None   # last price the agents saw
+        last: Optional[float] = None        # last price processed at all
+        moves: Deque[float] = deque(maxlen=self.window)
+        reported_drops = 0
+
+        while True:
+            tick = await mailbox.get()
+            if tick is None:
+                return
+            if reference is None:
+                reference = tick.price
+            elif last:
+                moves.append((tick.price - last) / last * 100)
+            last = tick.price
+
+            change = (tick.price - reference) / reference * 100 if reference else 0.0
+            volatility = statistics.pstdev(moves) if len(moves) > 1 else 0.0
+            result = TickResult(
+                tick=tick,
+                previous_price=reference,
+                change_percent=change,
+                volatility=volatility,
+                dropped_ticks=mailbox.dropped - reported_drops,
+            )
+            reported_drops = mailbox.dropped
+            self.stats["ticks"] += 1
+            self.stats["dropped"] += result.dropped_ticks
+
+            if abs(change) < self.threshold and volatility < self.volatility_threshold:
+                result.skipped = True
+                self.stats["skipped"] += 1
+            else:
+                self.stats["llm_ticks"] += 1
+                try:
+                    await self._analyse(result)
+                except Exception as e:
+                    # One failed agent call must not stop this symbol (or, via gather, the others);
+                    # the reference stays put so the next tick is compared to what the agents last saw
+                    result.error = f"{type(e).__name__}: {e}"
+                    self.stats["errors"] += 1
+                else:
+                    reference = tick.price
+            self.on_result(result)
+
+    async def _analyse(self, result: TickResult) -> None:
+        tick = result.tick
+        context = StockContext(
+            current_price=tick.price,
+            previous_price=result.previous_price,
+            threshold=self.threshold,
+        )
+        prompt = (
+            f"Symbol: {tick.symbol}, Current price: ${tick.price}, "
+            f"Previous price: ${result.previous_price}, Change: {result.change_percent:.2f}%"
+        )
+        async with self._llm_slots:
+            alert_result, analysis_result = await asyncio.gather(
+                alert_agent.run(prompt, deps=context),
+                analysis_agent.run(prompt, deps=context),
+            )
+        result.alert = alert_result.output
+        result.analysis = analysis_result.output
+
+def print_tick_result(result: TickResult) -> None:
+    tick = result.tick
+    print(f"\n[{tick.timestamp}] {tick.symbol} Price Update: ${tick.price}")
+    print(f"Change: {result.change_percent:.2f}% | Volatility: {result.volatility:.2f}%")
+    if result.dropped_ticks:
+        print(f"(coalesced {result.dropped_ticks} stale tick(s))")
+
+    if result.skipped:
+        print("Below threshold - no alert, LLM skipped.")
+    elif result.error:
+        print(f"Analysis failed: {result.error}")
+    else:
+        print("\n--- ALERT AGENT ---")
+        print(f"Alert Triggered: {result.alert.alert_triggered}")
+        print(f"Message: {result.alert.alert_message}")
+        print(f"Recommendation: {result.alert.recommendation}")
+
+        print("\n--- ANALYSIS AGENT ---")
+        print(f"Trend: {result.analysis.trend}")
+        print(f"Volatility: {result.analysis.volatility}")
+        print(f"Summary: {result.analysis.summary}")
+
+    print(f"\n{'-'*60}")
 
 async def process_real_time_stock(stock_symbol: str, threshold: float = 5.0):
     """Process real-time stock data and generate alerts & analysis"""
@@ -96,50 +287,17 @@ async def process_real_time_stock(stock_symbol: str, threshold: float = 5.0):
     print(f"Real-Time Stock Monitoring: {stock_symbol}")
     print(f"{'='*60}\n")
     
-    previous_price = 100.0
-    
-    async for stock_update in stock_price_stream(stock_symbol):
-        print(f"\n[{stock_update.timestamp}] Price Update: ${stock_update.price}")
-        print(f"Change: {stock_update.change_percent:.2f}%")
-        
-        # Create context for agents
-        context = StockContext(
-            current_price=stock_update.price,
-            previous_price=previous_price,
-            threshold=threshold
-        )
-        
-        # Run Alert Agent
-        alert_result = await alert_agent.run(
-            f"Current price: ${stock_update.price}, Previous price: ${previous_price}, Change: {stock_update.change_percent:.2f}%",
-            deps=context
-        )
-        
-        # Run Analysis Agent
-        analysis_result = await analysis_agent.run(
-            f"Current price: ${stock_update.price}, Previous price: ${previous_price}, Change: {stock_update.change_percent:.2f}%",
-            deps=context
-        )
-        
-        # Display Results
-        print("\n--- ALERT AGENT ---")
-        print(f"Alert Triggered: {alert_result.output.alert_triggered}")
-        print(f"Message: {alert_result.output.alert_message}")
-        print(f"Recommendation: {alert_result.output.recommendation}")
-        
-        print("\n--- ANALYSIS AGENT ---")
-        print(f"Trend: {analysis_result.output.trend}")
-        print(f"Volatility: {analysis_result.output.volatility}")
-        print(f"Summary: {analysis_result.output.summary}")
-        
-        print(f"\n{'-'*60}")
-        
-        previous_price = stock_update.price
+    await StockMonitor([stock_symbol], threshold=threshold).run()
 
 # ===== 7. Run Real-Time Agent =====
 
-import nest_asyncio
-nest_asyncio.apply()
+async def main(symbols: List[str], threshold: float = 5.0):
+    monitor = StockMonitor(symbols, threshold=threshold)
+    await monitor.run()
+    print(f"\nTicks: {monitor.stats['ticks']} | LLM: {monitor.stats['llm_ticks']} | "
+          f"Skipped: {monitor.stats['skipped']} | Dropped: {monitor.stats['dropped']} | "
+          f"Errors: {monitor.stats['errors']} | Failed sources: {len(monitor.source_errors)}")
 
-# Execute real-time monitoring
-asyncio.run(process_real_time_stock("AAPL", threshold=5.0))
\ No newline at end of file
+if __name__ == "__main__":
+    # Execute real-time monitoring
+    asyncio.run(main(sys.argv[1:] or ["AAPL"], threshold=5.0))
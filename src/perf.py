@@ -0,0 +1,198 @@
+"""
+Deterministic end-to-end performance regression harness.
+
+    # 1. Live run, capturing every model call and tool I/O into a cassette
+    python src/perf.py record questions.jsonl --cassette perf.cassette.json
+
+    # 2. Offline, deterministic replay; writes per-stage timings + allocations
+    python src/perf.py replay questions.jsonl --cassette perf.cassette.json --report perf_head.json
+
+    # 3. Compare two reports (e.g. from two commits); exits 1 on regressions
+    python src/perf.py compare perf_base.json perf_head.json --threshold 0.2 --min-delta-ms 0.5
+
+With the default --latency-scale 0, replay measures only local overhead
+(validation, message assembly, retrieval plumbing). Use 1.0 to re-enact the
+recorded network latencies, or anything in between to scale them.
+
+Timings are per stage; allocations are the tracemalloc peak per question, not
+per stage. Stages nest (a child agent's model calls run inside the orchestrator's
+tool call) and run on worker threads, so a process-wide peak can't be split
+between them.
+"""
+import os, sys
+sys.path.append(os.path.dirname(__file__))  # add ./src
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List
+
+from agent.cassette import Cassette, use_cassette
+from agent.health.health import health_agent
+from agent.orchestrator.orchestrator import ask_orchestrator, orchestrator_agent, OrchestratorDeps
+from agent.rag.collection_registry import load_retrieval_from_env
+from agent.rag.rag_agent import rag_agent
+from batch import read_questions
+
+AGENTS = {"orchestrator": orchestrator_agent, "rag": rag_agent, "health": health_agent}
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "total_ms": round(sum(ordered) * 1000, 3),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+    }
+
+
+def run(input_path: str, cassette: Cassette) -> Dict[str, Any]:
+    if cassette.mode == "replay":
+        # Retrieval is served from the cassette, so skip loading the embedding model
+        vector_db, collections = None, None
+    else:
+        vector_db, collections = load_retrieval_from_env("data/docs.md")
+    deps = OrchestratorDeps(vector_db=vector_db, profile_file="data/user_profile.json", collections=collections)
+
+    peaks: List[float] = []
+    errors = 0
+    tracemalloc.start()
+    try:
+        with use_cassette(cassette, AGENTS):
+            for item in read_questions(input_path):
+                tracemalloc.reset_peak()
+                start = time.perf_counter()
+                try:
+                    ask_orchestrator(item["question"], deps)
+                except Exception as e:
+                    errors += 1
+                    print(f"✗ {item['id']}: {e}")
+                cassette.record_timing("total", time.perf_counter() - start)
+                peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": _git_rev(),
+        "mode": cassette.mode,
+        "latency_scale": cassette.latency_scale,
+        "questions": len(peaks),
+        "errors": errors,
+        "stages": {stage: _summarize(samples) for stage, samples in sorted(cassette.timings.items())},
+        "allocations": {
+            "peak_kb_mean": round(statistics.mean(peaks), 1) if peaks else 0.0,
+            "peak_kb_max": round(max(peaks), 1) if peaks else 0.0,
+        },
+    }
+
+
+def _regressed(b: float, h: float, threshold: float, min_delta: float) -> bool:
+    # Both a relative and an absolute floor: sub-millisecond stages jitter by large percentages
+    return h - b > min_delta and (h - b) > threshold * b
+
+
+def compare(
+    base: Dict[str, Any],
+    head: Dict[str, Any],
+    threshold: float,
+    min_delta_ms: float = 0.5,
+    min_delta_kb: float = 64.0,
+) -> List[str]:
+    """Lines describing stages whose mean or p50 time, or the peak allocation, grew past both limits."""
+    regressions = []
+    print(f"{'stage':<28}{'metric':>8}{'base ms':>12}{'head ms':>12}{'change':>10}")
+    for stage in sorted(set(base["stages"]) | set(head["stages"])):
+        for metric in ("mean_ms", "p50_ms"):
+            b = base["stages"].get(stage, {}).get(metric)
+            h = head["stages"].get(stage, {}).get(metric)
+            label = metric[:-3]
+            if b is None or h is None:
+                print(f"{stage:<28}{label:>8}{b if b is not None else '-':>12}{h if h is not None else '-':>12}{'n/a':>10}")
+                continue
+            change = (h - b) / b if b else 0.0
+            print(f"{stage:<28}{label:>8}{b:>12.3f}{h:>12.3f}{change:>+10.1%}")
+            if _regressed(b, h, threshold, min_delta_ms):
+                regressions.append(f"{stage} {label}: {b:.3f}ms -> {h:.3f}ms ({change:+.1%})")
+
+    b, h = base["allocations"]["peak_kb_max"], head["allocations"]["peak_kb_max"]
+    change = (h - b) / b if b else 0.0
+    print(f"{'alloc peak_kb_max':<28}{'':>8}{b:>12.1f}{h:>12.1f}{change:>+10.1%}")
+    if _regressed(b, h, threshold, min_delta_kb):
+        regressions.append(f"allocations: {b:.1f}KB -> {h:.1f}KB ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay performance regression harness.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="live run, writing a cassette")
+    rec.add_argument("input")
+    rec.add_argument("--cassette", required=True)
+    rec.add_argument("--report")
+
+    rep = sub.add_parser("replay", help="offline run from a cassette")
+    rep.add_argument("input")
+    rep.add_argument("--cassette", required=True)
+    rep.add_argument("--latency-scale", type=float, default=0.0,
+                     help="sleep recorded latency x scale (0 = local overhead only)")
+    rep.add_argument("--report")
+
+    cmp_ = sub.add_parser("compare", help="compare two replay reports")
+    cmp_.add_argument("base")
+    cmp_.add_argument("head")
+    cmp_.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    cmp_.add_argument("--min-delta-ms", type=float, default=0.5,
+                      help="ignore stage slowdowns smaller than this, whatever their relative size")
+    cmp_.add_argument("--min-delta-kb", type=float, default=64.0,
+                      help="ignore peak allocation growth smaller than this")
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.head) as f:
+            head = json.load(f)
+        print(f"base {base['commit']} vs head {head['commit']}")
+        regressions = compare(base, head, args.threshold, args.min_delta_ms, args.min_delta_kb)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  ✗ {line}")
+            sys.exit(1)
+        print("\n✓ No regressions")
+        return
+
+    cassette = Cassette(args.cassette, args.command, latency_scale=getattr(args, "latency_scale", 0.0))
+    report = run(args.input, cassette)
+    output = args.report or f"perf_{report['commit']}_{args.command}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<28}{stats['count']:>6} calls  mean {stats['mean_ms']:.3f}ms  "
+              f"p50 {stats['p50_ms']:.3f}ms  p95 {stats['p95_ms']:.3f}ms")
+    print(f"Peak allocations per question: mean {report['allocations']['peak_kb_mean']}KB, max {report['allocations']['peak_kb_max']}KB")
+    print(f"Errors: {report['errors']}")
+    print(f"\nReport saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
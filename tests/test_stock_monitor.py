@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("GROQ_API_KEY", "test")
+pytest.importorskip("pydantic_ai")
+
+from models import schema
+from models.schema import AlertOutput, AnalysisOutput, StockMonitor, StockPrice
+
+
+class _Result:
+    def __init__(self, output):
+        self.output = output
+
+
+def _ticks(*prices, delay=0.0):
+    async def source(symbol):
+        for price in prices:
+            yield StockPrice(symbol=symbol, price=price, change_percent=0.0, timestamp="t")
+            await asyncio.sleep(delay)
+    return source
+
+
+@pytest.fixture
+def slow_agents(monkeypatch):
+    async def alert(prompt, deps):
+        await asyncio.sleep(0.05)
+        return _Result(AlertOutput(alert_triggered=True, alert_message="m", recommendation="r"))
+
+    async def analysis(prompt, deps):
+        await asyncio.sleep(0.05)
+        return _Result(AnalysisOutput(trend="uptrend", volatility="high", summary="s"))
+
+    monkeypatch.setattr(schema.alert_agent, "run", alert)
+    monkeypatch.setattr(schema.analysis_agent, "run", analysis)
+
+
+def test_source_ending_during_analysis_does_not_hang(slow_agents):
+    results = []
+    # The source finishes while the second tick is still being analysed
+    monitor = StockMonitor(["AAPL"], source=_ticks(100.0, 110.0, 121.0, 133.0, delay=0.01),
+                           on_result=results.append)
+    asyncio.run(asyncio.wait_for(monitor.run(), timeout=5))
+    assert results[-1].tick.price == 133.0
+    assert monitor.stats["dropped"] > 0
+
+
+def test_first_tick_does_not_count_as_a_move(slow_agents):
+    results = []
+    monitor = StockMonitor(["AAPL"], source=_ticks(100.0, 101.0, 102.0), on_result=results.append)
+    asyncio.run(monitor.run())
+    assert results[1].volatility == 0.0  # one real move; a fake 0% move would give 0.5
+    assert results[2].volatility == pytest.approx(0.0049, abs=1e-3)
+
+
+def test_failing_source_only_stops_its_symbol(slow_agents):
+    async def broken(symbol):
+        yield StockPrice(symbol=symbol, price=100.0, change_percent=0.0, timestamp="t")
+        raise ConnectionError("feed down")
+
+    async def source(symbol):
+        feed = broken if symbol == "BAD" else _ticks(100.0, 101.0, 102.0, delay=0.01)
+        async for tick in feed(symbol):
+            yield tick
+
+    results = []
+    monitor = StockMonitor(["BAD", "AAPL"], source=source, on_result=results.append)
+    asyncio.run(monitor.run())
+    assert list(monitor.source_errors) == ["BAD"]
+    assert [r.tick.price for r in results if r.tick.symbol == "AAPL"] == [100.0, 101.0, 102.0]